@@ -27,11 +27,20 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import logging
+import logging.handlers
 import os
+import queue
 
 import dotenv
 from server import Server
 
+try:
+    import uvloop
+except ImportError:
+    pass
+else:
+    uvloop.install()
+
 dotenv.load_dotenv()  # type: ignore
 
 
@@ -42,14 +51,22 @@ SOCKS_SECRET = os.getenv("SOCKS_SECRET")
 def setup_logging():
     logging.getLogger("socks").setLevel(logging.INFO)
     logger = logging.getLogger()
+    listener = None
     try:
         handler = logging.FileHandler(filename="socks.log", encoding="utf-8", mode="a")
         handler.setFormatter(
             logging.Formatter("%(asctime)s:%(levelname)s:%(name)s: %(message)s")
         )
-        logger.addHandler(handler)
+        # Hand records off to a queue so the file write happens on the
+        # listener's thread instead of blocking the event loop.
+        log_queue = queue.Queue[logging.LogRecord](-1)
+        listener = logging.handlers.QueueListener(log_queue, handler)
+        listener.start()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
         yield
     finally:
+        if listener is not None:
+            listener.stop()
         for handler in logger.handlers[:]:
             handler.close()
             logger.removeHandler(handler)
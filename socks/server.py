@@ -25,42 +25,77 @@ DEALINGS IN THE SOFTWARE.
 from __future__ import annotations
 
 import asyncio
-import io
-import json
 import logging
 import pathlib
 import ssl
-import traceback
-from typing import Any, Callable, Coroutine, Set
+from collections import defaultdict
+from typing import (
+    Any,
+    DefaultDict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    cast,
+)
 
 import aiohttp
+import orjson
 from aiohttp import web
-from socket_ import Socket
+from socket_ import Socket, pack_frame
 
 __all__ = ("Server",)
 
 _log = logging.getLogger(__name__)
 
+BROADCAST_BATCH_SIZE = 50
+INLINE_BROADCAST_MAX = 16
+MAX_CONCURRENT_BROADCASTS = 256
+MAX_WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _validate_channels(data: Any) -> Tuple[Optional[FrozenSet[str]], Optional[str]]:
+    channels = data.get("channels", [])
+    if not isinstance(channels, list):
+        return None, "Channels must be an array."
+    if not channels:
+        return None, "No channels provided."
+    return frozenset(cast(List[str], channels)), None
 
-def wrap_send(
-    coro: Callable[..., Coroutine[Any, Any, Any]]
-) -> Callable[..., Coroutine[Any, Any, Any]]:
-    async def predicate(data: Any):
-        try:
-            await coro(data)
-        except ConnectionResetError:
-            pass
 
-    return predicate
+_CERT_PATH = pathlib.Path(__file__).parent.parent / "cert.pem"
+_KEY_PATH = pathlib.Path(__file__).parent.parent / "key.pem"
+_HAVE_CERTS = _CERT_PATH.is_file() and _KEY_PATH.is_file()
 
 
 class Server:
+    __slots__ = (
+        "secret",
+        "websockets",
+        "sockets",
+        "channel_index",
+        "loop",
+        "port",
+        "ssl_context",
+        "broadcast_semaphore",
+        "server",
+        "runner",
+        "site",
+    )
+
     def __init__(self, secret: str, loop: asyncio.AbstractEventLoop, port: int = 9093):
         self.secret: str = secret
         self.websockets: Set[web.WebSocketResponse] = set()
         self.sockets: Set[Socket] = set()
+        self.channel_index: DefaultDict[str, Set[Socket]] = defaultdict(set)
         self.loop: asyncio.AbstractEventLoop = loop
         self.port: int = port
+        self.ssl_context: Optional[ssl.SSLContext] = self._build_ssl_context()
+        self.broadcast_semaphore: asyncio.Semaphore = asyncio.Semaphore(
+            MAX_CONCURRENT_BROADCASTS
+        )
         self.server: web.Application
         self.runner: web.AppRunner
         self.site: web.TCPSite
@@ -70,73 +105,94 @@ class Server:
         await websocket.prepare(req)
         socket = None
         self.websockets.add(websocket)
-        async for message in websocket:
-            try:
-                if message.type == aiohttp.WSMsgType.CLOSE:  # type: ignore
-                    if socket is not None:
-                        self.sockets.remove(socket)
-                    return
-                elif message.type == aiohttp.WSMsgType.TEXT:  # type: ignore
-                    try:
-                        data = message.json()
-                    except json.JSONDecodeError:
-                        await websocket.send_json(
-                            {"success": False, "error": "Invalid JSON."}
-                        )
-                        continue
-                    channels = data.get("channels", [])
-                    channels_set = set(channels)
-                    if not channels:
-                        await websocket.send_json(
-                            {"success": False, "error": "No channels provided."}
-                        )
-                        continue
-                    if not isinstance(channels, list):
-                        await websocket.send_json(
-                            {"success": False, "error": "Channels must be an array."}
+        # Hoist attribute lookups out of the receive loop; they add up at
+        # high message rates.
+        close_type = aiohttp.WSMsgType.CLOSE  # type: ignore
+        text_type = aiohttp.WSMsgType.TEXT  # type: ignore
+        send_json = websocket.send_json
+        try:
+            async for message in websocket:
+                try:
+                    if message.type == close_type:  # type: ignore
+                        return
+                    elif message.type == text_type:  # type: ignore
+                        try:
+                            data = orjson.loads(message.data)  # type: ignore
+                        except orjson.JSONDecodeError:
+                            channels_set, error_message = None, "Invalid JSON."
+                        else:
+                            channels_set, error_message = _validate_channels(data)
+                        if channels_set is None:
+                            await send_json({"success": False, "error": error_message})
+                            continue
+                        if socket is None:
+                            socket = Socket.from_websocket(websocket, channels_set)
+                            self.sockets.add(socket)
+                            self._index_add(socket, channels_set)
+                        elif channels_set != socket.channels:
+                            self._index_remove(socket, socket.channels - channels_set)
+                            self._index_add(socket, channels_set - socket.channels)
+                            socket.channels = channels_set
+                        await send_json(
+                            {"success": True, "channels": list(channels_set)}
                         )
-                        continue
-                    if socket is None:
-                        socket = Socket.from_websocket(websocket, channels_set)
-                        self.sockets.add(socket)
-                    else:
-                        socket.channels = channels_set
-                    await websocket.send_json(
-                        {"success": True, "channels": list(set(channels_set))}
-                    )
-            except Exception as error:
-                f = io.StringIO()
-                f.write("Ignoring exception in websocket:\n")
-                traceback.print_exception(
-                    type(error), error, error.__traceback__, file=f
-                )
-                _log.warning(f.getvalue())
+                except Exception as error:
+                    _log.warning("Ignoring exception in websocket", exc_info=error)
+        finally:
+            self.websockets.discard(websocket)
+            if socket is not None:
+                self.sockets.discard(socket)
+                self._index_remove(socket, socket.channels)
+
+    def _index_add(self, socket: Socket, channels: FrozenSet[str], /) -> None:
+        for channel in channels:
+            self.channel_index[channel].add(socket)
+
+    def _index_remove(self, socket: Socket, channels: FrozenSet[str], /) -> None:
+        for channel in channels:
+            subscribers = self.channel_index.get(channel)
+            if subscribers is not None:
+                subscribers.discard(socket)
+                if not subscribers:
+                    del self.channel_index[channel]
 
     async def send_handler(self, req: web.Request) -> web.Response:
         if req.headers.get("Authorization") != self.secret:
             raise web.HTTPUnauthorized()
-        data = await req.json()
+        data = orjson.loads(await req.read())
         if "channels" not in data or "event" not in data:
             raise web.HTTPBadRequest()
         if not data["channels"] or not data["event"]:
             raise web.HTTPBadRequest()
-        self.loop.create_task(self.send_channels(set(data["channels"]), data["event"]))
+        payload = orjson.dumps(data["event"])
+        channels = data["channels"]
+        index = self.channel_index
+        # Upper bound on recipients, cheap to compute from the index. Small
+        # fan-outs are sent inline to skip Task creation overhead.
+        count = sum(len(index[channel]) for channel in channels if channel in index)
+        if count <= INLINE_BROADCAST_MAX:
+            await self.send_channels(channels, payload)
+        else:
+            self.loop.create_task(self.send_channels(channels, payload))
         raise web.HTTPCreated()
 
+    @staticmethod
+    def _build_ssl_context() -> Optional[ssl.SSLContext]:
+        if not _HAVE_CERTS:
+            return None
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(_CERT_PATH, _KEY_PATH)
+        # Prefer AES-GCM suites for AES-NI-accelerated record processing.
+        ssl_context.set_ciphers("ECDHE+AESGCM:ECDHE+CHACHA20")
+        return ssl_context
+
     async def start_coro(self) -> None:
         self.runner = web.AppRunner(self.server)
         await self.runner.setup()
-        cert_path = pathlib.Path(__file__).parent.parent / "cert.pem"
-        key_path = pathlib.Path(__file__).parent.parent / "key.pem"
-        if cert_path.is_file() and key_path.is_file():
-            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-            ssl_context.load_cert_chain(cert_path, key_path)
-        else:
-            ssl_context = None
         self.site = web.TCPSite(
             self.runner,
             port=self.port,
-            ssl_context=ssl_context,
+            ssl_context=self.ssl_context,
         )
         await self.site.start()
 
@@ -147,8 +203,32 @@ class Server:
         )
         self.loop.create_task(self.start_coro())
 
-    async def send_channels(self, channels: Set[str], event: dict[str, Any]) -> None:
-        coros = [
-            socket.send(event) for socket in self.sockets if channels & socket.channels
-        ]
-        await asyncio.gather(*coros, return_exceptions=True)
+    async def send_channels(self, channels: Iterable[str], payload: bytes) -> None:
+        # Bound the number of in-flight broadcasts so a burst of sends
+        # doesn't pile up unbounded work on the loop.
+        async with self.broadcast_semaphore:
+            # Frame the payload once; every subscriber receives identical
+            # bytes.
+            frame = pack_frame(payload)
+            target_set: Set[Socket] = set()
+            for channel in channels:
+                subscribers = self.channel_index.get(channel)
+                if subscribers is not None:
+                    target_set |= subscribers
+            targets = list(target_set)
+            for i in range(0, len(targets), BROADCAST_BATCH_SIZE):
+                # Yield to the loop between batches so a large fan-out
+                # doesn't starve WebSocket reads or the send endpoint.
+                if i:
+                    await asyncio.sleep(0)
+                for socket in targets[i : i + BROADCAST_BATCH_SIZE]:
+                    socket.write_frame(frame)
+                    if socket.write_buffer_size > MAX_WRITE_BUFFER_SIZE:
+                        # A subscriber that has stopped reading would
+                        # otherwise accumulate every broadcast in server
+                        # memory; drop it rather than stall the fan-out.
+                        _log.warning(
+                            "Dropping subscriber with %d buffered bytes",
+                            socket.write_buffer_size,
+                        )
+                        socket.abort()
@@ -24,23 +24,64 @@ DEALINGS IN THE SOFTWARE.
 
 from __future__ import annotations
 
-from typing import Any, Coroutine, Dict, Set
+import asyncio
+import struct
+from typing import Callable, FrozenSet
 
 from aiohttp import web
 
-__all__ = ("Socket",)
+__all__ = ("Socket", "pack_frame")
+
+_PACK_LEN1 = struct.Struct("!BB").pack
+_PACK_LEN2 = struct.Struct("!BBH").pack
+_PACK_LEN3 = struct.Struct("!BBQ").pack
+
+# FIN bit set, TEXT opcode, no compression.
+_TEXT_FRAME_HEAD = 0x80 | 0x1
+
+
+def pack_frame(payload: bytes, /) -> bytes:
+    # Server-to-client frames are unmasked, so the frame is just a short
+    # header followed by the payload.
+    length = len(payload)
+    if length < 126:
+        return _PACK_LEN1(_TEXT_FRAME_HEAD, length) + payload
+    if length < 65536:
+        return _PACK_LEN2(_TEXT_FRAME_HEAD, 126, length) + payload
+    return _PACK_LEN3(_TEXT_FRAME_HEAD, 127, length) + payload
 
 
 class Socket:
-    def __init__(self, websocket: web.WebSocketResponse, channels: Set[str], /) -> None:
+    __slots__ = ("websocket", "channels", "_transport", "_write")
+
+    def __init__(
+        self, websocket: web.WebSocketResponse, channels: FrozenSet[str], /
+    ) -> None:
         self.websocket: web.WebSocketResponse = websocket
-        self.channels: Set[str] = channels
+        self.channels: FrozenSet[str] = channels
+        # The websocket is already prepared by the time a Socket exists, so
+        # the transport is stable; cache it and the bound write to skip the
+        # attribute traversal on every broadcast.
+        self._transport: asyncio.Transport = websocket._writer.transport  # type: ignore
+        self._write: Callable[[bytes], None] = self._transport.write
 
     @classmethod
     def from_websocket(
-        cls, websocket: web.WebSocketResponse, channels: Set[str], /
+        cls, websocket: web.WebSocketResponse, channels: FrozenSet[str], /
     ) -> Socket:
         return cls(websocket, channels)
 
-    def send(self, data: Dict[str, Any], /) -> Coroutine[Any, Any, None]:
-        return self.websocket.send_json(data)
+    def write_frame(self, frame: bytes, /) -> None:
+        # Write a pre-built frame straight to the transport, skipping the
+        # coroutine and drain bookkeeping in aiohttp's writer. The transport
+        # buffers internally, so this never blocks.
+        self._write(frame)
+
+    @property
+    def write_buffer_size(self) -> int:
+        return self._transport.get_write_buffer_size()
+
+    def abort(self) -> None:
+        # Tear the connection down immediately; connection_lost ends the
+        # receive loop in ws_handler, which performs the usual cleanup.
+        self._transport.abort()